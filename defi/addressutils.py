@@ -56,9 +56,18 @@ def checksum(v):
     return sha256(sha256(v).digest()).digest()[0:4]
 
 
-def wif_to_private_key(s):
-    b = b58decode(s)
-    return hexlify(b).decode()[2:-10]
+# Mainnet and testnet WIF version bytes
+WIF_VERSIONS = (0x80, 0xef)
+
+
+# Get raw private key bytes from WIF, only compressed keys are supported
+def private_key_bytes(wif):
+    decoded = b58decode(wif)
+    if len(decoded) != 38 or decoded[0] not in WIF_VERSIONS or decoded[33] != 1 or \
+            checksum(decoded[:-4]) != decoded[-4:]:
+        raise ValueError("Invalid private key, must be a compressed WIF private key")
+
+    return decoded[1:33]
 
 
 def private_to_public_key(pk):
@@ -72,7 +81,22 @@ def private_to_public_key(pk):
 
 
 def signing_key(privateKey):
-    return SigningKey.from_string(unhexlify(wif_to_private_key(privateKey)), curve=SECP256k1)
+    # Key vault handles provide their own keys
+    if hasattr(privateKey, 'signing_key'):
+        return privateKey.signing_key()
+
+    return SigningKey.from_string(private_key_bytes(privateKey), curve=SECP256k1)
+
+
+# Compressed public key hex, pass sk to avoid decoding the private key again
+def public_key(privateKey, sk=None):
+    if hasattr(privateKey, 'public_key'):
+        return privateKey.public_key()
+
+    if sk is None:
+        sk = signing_key(privateKey)
+
+    return private_to_public_key(sk.get_verifying_key())
 
 
 def scriptpubkey_from_address(addr):
@@ -80,9 +104,7 @@ def scriptpubkey_from_address(addr):
 
 
 def scriptkey_from_private_segwit(privateKey):
-    sk = signing_key(privateKey)
-    vk = sk.get_verifying_key()
-    pk = private_to_public_key(vk)
+    pk = public_key(privateKey)
 
     pubkey_hash160 = hash160_public(pk)
     redeem_script = defi.transactions.OutputScript.P2WPKH(pubkey_hash160)
@@ -92,9 +114,7 @@ def scriptkey_from_private_segwit(privateKey):
 
 
 def scriptkey_from_private(privateKey):
-    sk = signing_key(privateKey)
-    vk = sk.get_verifying_key()
-    pk = private_to_public_key(vk)
+    pk = public_key(privateKey)
 
     return defi.transactions.OutputScript.P2PKH(hash160_public(pk)).content
 
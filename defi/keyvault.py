@@ -0,0 +1,176 @@
+# Copyright (c) DeFi Blockchain Developers
+
+import atexit
+import ctypes
+import hmac
+import json
+import mmap
+import os
+import warnings
+from hashlib import scrypt, sha256, shake_256
+
+from ecdsa import SigningKey, SECP256k1
+
+import defi.addressutils
+
+KEY_SIZE = 32
+
+# scrypt parameters used to derive the keystore encryption and MAC keys
+SCRYPT_N = 16384
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+
+# Derive encryption and MAC keys from passphrase
+def _derive_keys(passphrase, salt):
+    derived = scrypt(passphrase.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=64)
+    return derived[:32], derived[32:]
+
+
+# Keystream for encrypting keys, SHAKE256 of encryption key and nonce
+def _keystream(enc_key, nonce, size):
+    return shake_256(enc_key + nonce).digest(size)
+
+
+def _mac(mac_key, salt, nonce, ciphertext):
+    return hmac.new(mac_key, salt + nonce + ciphertext, sha256).digest()
+
+
+# Create encrypted keystore file from a list of WIF private keys
+def create_keystore(path, passphrase, wifs):
+    plaintext = bytearray()
+    for wif in wifs:
+        plaintext += defi.addressutils.private_key_bytes(wif)
+
+    salt = os.urandom(16)
+    nonce = os.urandom(16)
+    enc_key, mac_key = _derive_keys(passphrase, salt)
+    stream = _keystream(enc_key, nonce, len(plaintext))
+    ciphertext = bytes(p ^ s for p, s in zip(plaintext, stream))
+
+    # Wipe plaintext copy
+    plaintext[:] = bytes(len(plaintext))
+
+    keystore = {
+        "salt": salt.hex(),
+        "nonce": nonce.hex(),
+        "ciphertext": ciphertext.hex(),
+        "mac": _mac(mac_key, salt, nonce, ciphertext).hex(),
+    }
+
+    # Keystore is only readable by the owner, never overwrite an existing one
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(keystore, f)
+
+
+# Try to stop a memory region from being swapped, not supported everywhere.
+# Returns True if the region was locked.
+def _lock_memory(region):
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        buffer = ctypes.c_char.from_buffer(region)
+        try:
+            result = libc.mlock(ctypes.c_void_p(ctypes.addressof(buffer)), ctypes.c_size_t(len(region)))
+        finally:
+            del buffer
+    except (AttributeError, OSError, TypeError) as e:
+        warnings.warn("Key vault memory could not be locked: " + str(e))
+        return False
+
+    if result != 0:
+        warnings.warn("Key vault memory could not be locked: " + os.strerror(ctypes.get_errno()))
+        return False
+
+    return True
+
+
+# Opaque reference to a private key held in a KeyVault, can be passed
+# anywhere a WIF private key is accepted.
+class KeyHandle:
+
+    def __init__(self, vault, slot):
+        self._vault = vault
+        self._slot = slot
+
+    def signing_key(self):
+        return self._vault.signing_key(self._slot)
+
+    def public_key(self):
+        return self._vault.public_key(self._slot)
+
+    def __repr__(self):
+        return "KeyHandle(" + str(self._slot) + ")"
+
+
+# Holds private keys decrypted from a keystore file in a single memory region
+# and hands them out as KeyHandle objects. The region is locked against swapping
+# where possible. If it could not be locked, for example when RLIMIT_MEMLOCK is
+# too low, a warning is raised and locked is False. The region is wiped on close
+# or at interpreter exit. A signing key is built from the region for each
+# signature and dropped afterwards, ecdsa keeps its copy of the secret as a
+# Python int in ordinary memory which cannot be wiped.
+class KeyVault:
+
+    def __init__(self, path, passphrase):
+        with open(path) as f:
+            keystore = json.load(f)
+
+        salt = bytes.fromhex(keystore['salt'])
+        nonce = bytes.fromhex(keystore['nonce'])
+        ciphertext = bytes.fromhex(keystore['ciphertext'])
+        enc_key, mac_key = _derive_keys(passphrase, salt)
+
+        if not hmac.compare_digest(_mac(mac_key, salt, nonce, ciphertext), bytes.fromhex(keystore['mac'])):
+            raise ValueError("Incorrect passphrase or corrupted keystore")
+
+        if not ciphertext or len(ciphertext) % KEY_SIZE != 0:
+            raise ValueError("Keystore contains no valid keys")
+
+        # Decrypt directly into the region
+        self._region = mmap.mmap(-1, len(ciphertext))
+        self.locked = _lock_memory(self._region)
+        stream = _keystream(enc_key, nonce, len(ciphertext))
+        for i in range(len(ciphertext)):
+            self._region[i] = ciphertext[i] ^ stream[i]
+
+        self._public_keys = {}
+        self.handles = [KeyHandle(self, slot) for slot in range(len(ciphertext) // KEY_SIZE)]
+
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _check_open(self):
+        if self._region is None:
+            raise ValueError("Key vault has been closed")
+
+    # Short lived signing key for slot, read straight from the region without copying
+    def signing_key(self, slot):
+        self._check_open()
+        start = slot * KEY_SIZE
+        with memoryview(self._region) as view, view[start:start + KEY_SIZE] as key:
+            return SigningKey.from_string(key, curve=SECP256k1)
+
+    # Compressed public key hex for slot, created on first use
+    def public_key(self, slot):
+        if slot not in self._public_keys:
+            vk = self.signing_key(slot).get_verifying_key()
+            self._public_keys[slot] = defi.addressutils.private_to_public_key(vk)
+
+        return self._public_keys[slot]
+
+    # Wipe keys and release memory region
+    def close(self):
+        if self._region is None:
+            return
+
+        self._public_keys.clear()
+        self._region[:] = bytes(len(self._region))
+        self._region.close()
+        self._region = None
+        atexit.unregister(self.close)
@@ -0,0 +1,116 @@
+# Copyright (c) DeFi Blockchain Developers
+
+import struct
+
+UPDATE_TOKEN_MARKER = b'DfTxn'
+
+SYMBOL_MAX_LENGTH = 8
+NAME_MAX_LENGTH = 128
+
+# Token flag bits
+FLAG_MINTABLE = 0x01
+FLAG_TRADEABLE = 0x02
+FLAG_DAT = 0x04
+FLAG_FINALIZED = 0x10
+
+# Metadata key, gettoken key and flag bit for each owner configurable flag
+TOKEN_FLAGS = (
+    ("mintable", "mintable", FLAG_MINTABLE),
+    ("tradeable", "tradeable", FLAG_TRADEABLE),
+    ("isDAT", "isDAT", FLAG_DAT),
+    ("finalize", "finalized", FLAG_FINALIZED),
+)
+
+
+# Truncate string to a maximum number of UTF-8 bytes without splitting a character
+def _truncate_bytes(value, limit):
+    return value.encode()[0:limit].decode(errors='ignore')
+
+
+# Resolve the full set of token values from metadata, falling back to the current token info
+def resolve_token_values(token_info, metadata):
+    symbol = token_info['symbol']
+    if "symbol" in metadata:
+        symbol = _truncate_bytes(metadata['symbol'].strip(), SYMBOL_MAX_LENGTH)
+
+    name = token_info['name']
+    if "name" in metadata:
+        name = _truncate_bytes(metadata['name'].strip(), NAME_MAX_LENGTH)
+
+    flags = 0
+    for meta_key, info_key, bit in TOKEN_FLAGS:
+        if metadata.get(meta_key, token_info[info_key]):
+            flags |= bit
+
+    return symbol, name, flags
+
+
+# Flags currently set on a token according to gettoken
+def current_token_flags(token_info):
+    flags = 0
+    for _, info_key, bit in TOKEN_FLAGS:
+        if token_info[info_key]:
+            flags |= bit
+
+    return flags
+
+
+# Check whether resolved token values differ from the current token info
+def token_values_changed(token_info, symbol, name, flags):
+    return symbol != token_info['symbol'] or name != token_info['name'] or \
+        flags != current_token_flags(token_info)
+
+
+# Check whether applying metadata would change anything on the token
+def token_needs_update(token_info, metadata):
+    return token_values_changed(token_info, *resolve_token_values(token_info, metadata))
+
+
+# Append a CompactSize length prefixed string to the payload buffer
+def _append_string(buffer, value):
+    data = value.encode()
+    size = len(data)
+    if size < 253:
+        buffer.append(size)
+    elif size <= 0xFFFF:
+        buffer.append(0xFD)
+        buffer += struct.pack('<H', size)
+    else:
+        buffer.append(0xFE)
+        buffer += struct.pack('<L', size)
+    buffer += data
+
+
+# Build updatetoken payload from resolved token values
+def build_update_token_payload(creation_tx, symbol, name, flags):
+    buffer = bytearray(UPDATE_TOKEN_MARKER)
+    buffer += bytes.fromhex(creation_tx)[::-1]
+    _append_string(buffer, symbol)
+    _append_string(buffer, name)
+    buffer.append(8)  # uint8_t decimal, fixed to 8 places
+    buffer += bytes(8)  # int64_t limit, not tracked
+    buffer.append(flags)
+
+    return buffer.hex()
+
+
+# Build updatetoken payload for the OP_RETURN data output
+def make_update_token_payload(token_info, metadata):
+    return build_update_token_payload(token_info['creationTx'], *resolve_token_values(token_info, metadata))
+
+
+# Plan updates for many tokens at once. token_infos maps token ID to cached gettoken
+# results and updates maps token ID to the desired metadata. Only tokens with changes
+# are returned, as a list of (token ID, payload) tuples in the order of updates.
+def plan_token_updates(token_infos, updates):
+    plan = []
+    for token_id, metadata in updates.items():
+        if token_id not in token_infos:
+            raise KeyError("No token info for token " + str(token_id))
+
+        token_info = token_infos[token_id]
+        values = resolve_token_values(token_info, metadata)
+        if token_values_changed(token_info, *values):
+            plan.append((token_id, build_update_token_payload(token_info['creationTx'], *values)))
+
+    return plan
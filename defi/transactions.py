@@ -194,8 +194,7 @@ def make_segwit_transaction_hash(txid, index, scriptsig, amount, payload, script
 def make_signed_transaction(privatekey, txid, index, amount, payload, segwit=False):
     # Get various keys
     sk = defi.addressutils.signing_key(privatekey)
-    vk = sk.get_verifying_key()
-    pk = defi.addressutils.private_to_public_key(vk)
+    pk = defi.addressutils.public_key(privatekey, sk)
 
     pubkey_hash160 = defi.addressutils.hash160_public(pk)
 
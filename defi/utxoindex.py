@@ -0,0 +1,222 @@
+# Copyright (c) DeFi Blockchain Developers
+
+import json
+import sqlite3
+from decimal import Decimal
+from subprocess import PIPE, run
+
+COIN = 100000000
+MIN_INPUT_AMOUNT = 10000  # Enough to cover 0.0001 fee
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS utxos (
+    txid TEXT NOT NULL,
+    vout INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    script_pubkey TEXT NOT NULL,
+    height INTEGER NOT NULL,
+    PRIMARY KEY (txid, vout)
+);
+CREATE INDEX IF NOT EXISTS utxos_by_address ON utxos (address, amount);
+CREATE INDEX IF NOT EXISTS utxos_by_script ON utxos (script_pubkey, amount);
+CREATE INDEX IF NOT EXISTS utxos_by_amount ON utxos (amount);
+CREATE TABLE IF NOT EXISTS watched (
+    address TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS sync (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    height INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+'''
+
+
+# Run defi-cli command and return its output
+def _cli(cli, *args):
+    result = run([cli] + list(args), stdout=PIPE, stderr=PIPE)
+    if result.returncode != 0 or len(result.stderr) > 0:
+        raise RuntimeError(result.stderr.decode().rstrip())
+
+    return result.stdout.decode().rstrip()
+
+
+# Current chain tip height and hash from defi-cli
+def tip_from_cli(cli="./defi-cli"):
+    height = int(_cli(cli, "getblockcount"))
+    return height, _cli(cli, "getblockhash", str(height))
+
+
+# Get confirmed listunspent entries for addresses from defi-cli
+def listunspent_from_cli(addresses, cli="./defi-cli"):
+    return json.loads(_cli(cli, "listunspent", "1", "9999999", json.dumps(addresses)), parse_float=Decimal)
+
+
+# Get listunspent entries saved to a JSON file
+def listunspent_from_file(path):
+    with open(path) as f:
+        return json.load(f, parse_float=Decimal)
+
+
+# Get a decoded block from defi-cli and return its hash, previous block hash, spent
+# outpoints and listunspent style entries for every output with an address.
+def block_from_cli(height, cli="./defi-cli"):
+    block_hash = _cli(cli, "getblockhash", str(height))
+    block = json.loads(_cli(cli, "getblock", block_hash, "2"), parse_float=Decimal)
+
+    spent = []
+    created = []
+    for tx in block['tx']:
+        for vin in tx['vin']:
+            if "txid" in vin:  # Coinbase inputs have no outpoint
+                spent.append((vin['txid'], vin['vout']))
+
+        for vout in tx['vout']:
+            script = vout['scriptPubKey']
+            addresses = script.get('addresses', [script['address']] if "address" in script else [])
+            if len(addresses) == 1:
+                created.append({"txid": tx['txid'], "vout": vout['n'], "address": addresses[0],
+                                "amount": vout['value'], "scriptPubKey": script['hex']})
+
+    return block_hash, block.get('previousblockhash'), spent, created
+
+
+# Convert listunspent style amount to Satoshis
+def amount_to_satoshis(amount):
+    return int(Decimal(str(amount)) * COIN)
+
+
+# Whether a scriptPubKey can be spent by make_signed_transaction. P2SH outputs are taken
+# to be P2SH-P2WPKH, callers must only pass scripts made from their own key.
+def script_has_segwit(script_pubkey):
+    if len(script_pubkey) == 50 and script_pubkey.startswith("76a914") and script_pubkey.endswith("88ac"):
+        return False
+    if len(script_pubkey) == 46 and script_pubkey.startswith("a914") and script_pubkey.endswith("87"):
+        return True
+
+    raise ValueError("Unsupported scriptPubKey " + script_pubkey + ", must be P2PKH or P2SH-P2WPKH")
+
+
+# Local index of UTXOs for watched owner and collateral addresses, stored in SQLite
+class UtxoIndex:
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    # Height the index has been synced to, -1 if never synced
+    def height(self):
+        row = self.db.execute("SELECT height FROM sync WHERE id = 0").fetchone()
+        return row[0] if row else -1
+
+    # Hash of the block the index has been synced to, None if never synced
+    def block_hash(self):
+        row = self.db.execute("SELECT hash FROM sync WHERE id = 0").fetchone()
+        return row[0] if row else None
+
+    # Addresses tracked by the index
+    def watched(self):
+        return [row[0] for row in self.db.execute("SELECT address FROM watched ORDER BY address")]
+
+    def _set_tip(self, height, block_hash):
+        self.db.execute("INSERT OR REPLACE INTO sync (id, height, hash) VALUES (0, ?, ?)", (height, block_hash))
+
+    @staticmethod
+    def _row(entry, height):
+        return (entry['txid'], entry['vout'], entry['address'], amount_to_satoshis(entry['amount']),
+                entry['scriptPubKey'], height)
+
+    # Replace the whole index with listunspent entries for addresses taken at the tip
+    # block. addresses become the watched addresses. tip_height is used to work out the
+    # height of each entry from its confirmations, unconfirmed entries are skipped as
+    # they are added by apply_block once mined.
+    def load_listunspent(self, addresses, entries, tip_height, tip_hash):
+        for entry in entries:
+            if entry['address'] not in addresses:
+                raise ValueError("listunspent entry for unwatched address " + entry['address'])
+
+        with self.db:
+            self.db.execute("DELETE FROM watched")
+            self.db.executemany("INSERT INTO watched (address) VALUES (?)", [(a,) for a in set(addresses)])
+            self.db.execute("DELETE FROM utxos")
+            self.db.executemany("INSERT OR REPLACE INTO utxos VALUES (?, ?, ?, ?, ?, ?)",
+                                [self._row(e, tip_height - e['confirmations'] + 1) for e in entries
+                                 if e.get('confirmations', 0) > 0])
+            self._set_tip(tip_height, tip_hash)
+
+    # Load the index for addresses from defi-cli. The tip is read before and after
+    # listunspent and the load is retried if a block arrived in between.
+    def load_from_cli(self, addresses, cli="./defi-cli"):
+        while True:
+            tip = tip_from_cli(cli)
+            entries = listunspent_from_cli(addresses, cli)
+            if tip_from_cli(cli) == tip:
+                break
+
+        self.load_listunspent(addresses, entries, *tip)
+
+    # Apply the next block to the index. spent is a list of (txid, vout) tuples and created
+    # is a list of listunspent style entries, only entries for watched addresses are kept.
+    # Blocks must be applied in order, if prev_hash does not match the synced block there
+    # has been a reorg and the index needs to be reloaded.
+    def apply_block(self, height, block_hash, prev_hash, spent, created):
+        synced_height = self.height()
+        if synced_height < 0:
+            raise ValueError("Index must be loaded before applying blocks")
+        if height != synced_height + 1:
+            raise ValueError("Expected block height " + str(synced_height + 1) + ", got " + str(height))
+        if prev_hash != self.block_hash():
+            raise ValueError("Block " + block_hash + " does not follow synced block " + self.block_hash() +
+                             ", reload index after reorg")
+
+        watched = set(self.watched())
+        with self.db:
+            # Insert before deleting so outputs created and spent in the same block are removed
+            self.db.executemany("INSERT OR REPLACE INTO utxos VALUES (?, ?, ?, ?, ?, ?)",
+                                [self._row(e, height) for e in created if e['address'] in watched])
+            self.db.executemany("DELETE FROM utxos WHERE txid = ? AND vout = ?", spent)
+            self._set_tip(height, block_hash)
+
+    # Apply blocks from defi-cli until the index reaches the chain tip
+    def sync_from_cli(self, cli="./defi-cli"):
+        tip_height = int(_cli(cli, "getblockcount"))
+        for height in range(self.height() + 1, tip_height + 1):
+            self.apply_block(height, *block_from_cli(height, cli))
+
+    # Remove a UTXO once used as an input so chained builders do not reuse it
+    def mark_spent(self, txid, vout):
+        with self.db:
+            self.db.execute("DELETE FROM utxos WHERE txid = ? AND vout = ?", (txid, vout))
+
+    # Smallest UTXO paying to script_pubkey with at least amount Satoshis. Pass the script
+    # for the signing key, scriptkey_from_private or scriptkey_from_private_segwit, so the
+    # input can be spent by make_signed_transaction. Returns the same (txid, vout, amount,
+    # has_segwit) tuple as user_utxo or None if nothing found.
+    def select_utxo(self, script_pubkey, amount=MIN_INPUT_AMOUNT):
+        has_segwit = script_has_segwit(script_pubkey)
+        row = self.db.execute("SELECT txid, vout, amount FROM utxos "
+                              "WHERE script_pubkey = ? AND amount >= ? ORDER BY amount LIMIT 1",
+                              (script_pubkey, amount)).fetchone()
+        if row is None:
+            return None
+
+        txid, vout, utxo_amount = row
+
+        return txid, vout, utxo_amount, has_segwit
+
+    # All UTXOs for address, largest first
+    def address_utxos(self, address):
+        return self.db.execute("SELECT txid, vout, amount FROM utxos WHERE address = ? ORDER BY amount DESC",
+                               (address,)).fetchall()
+
+    def balance(self, address):
+        return self.db.execute("SELECT COALESCE(SUM(amount), 0) FROM utxos WHERE address = ?", (address,)).fetchone()[0]
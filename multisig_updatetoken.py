@@ -8,6 +8,9 @@ import sys
 from decimal import Decimal
 from subprocess import PIPE, run
 
+# defi directory must be included
+from defi.tokenupdate import make_update_token_payload, token_needs_update
+
 
 # Check for errors from running defi-cli commands
 def check_error(res):
@@ -46,6 +49,10 @@ tokenInfo = json.loads(result.stdout)[sys.argv[1]]
 # Get metadata argument
 metadata = parse_json(sys.argv[2])
 
+# Nothing to do if metadata matches the current token, avoids paying fee for a no-op update
+if not token_needs_update(tokenInfo, metadata):
+    sys.exit("metadata matches current token values, no update required")
+
 # Get input
 utxo = parse_json(sys.argv[5])
 
@@ -91,71 +98,7 @@ check_error(multisigScriptpubkey)
 multisigScriptpubkey = json.loads(multisigScriptpubkey.stdout)['scriptPubKey']
 
 # Create payload data for OP_RETURN data output
-creationTxReversed = "".join(reversed([tokenInfo['creationTx'][i:i + 2] for i in range(0, len(tokenInfo['creationTx']), 2)]))
-updateTokenPayload = "446654786e" + creationTxReversed
-
-# Add token symbol
-if "symbol" in metadata:
-    symbol = metadata["symbol"].strip()[0:8]  # 8 max symbol length
-    updateTokenPayload += f"{len(symbol):02x}"
-    updateTokenPayload += symbol.encode().hex()
-else:
-    updateTokenPayload += f"{len(tokenInfo['symbol']):02x}"
-    updateTokenPayload += tokenInfo["symbol"].encode().hex()
-
-# Add token name
-if "name" in metadata:
-    name = metadata["name"].strip()[0:128]  # 128 max symbol length
-    updateTokenPayload += f"{len(name):02x}"
-    updateTokenPayload += name.encode().hex()
-else:
-    updateTokenPayload += f"{len(tokenInfo['symbol']):02x}"
-    updateTokenPayload += tokenInfo["symbol"].encode().hex()
-
-# Add uint8_t decimal, fixed to 8 places
-updateTokenPayload += "08"
-
-# Add int64_t limit, not tracked
-updateTokenPayload += "0000000000000000"
-
-# Get bools for flags
-if "mintable" in metadata:
-    mintable = metadata['mintable']
-else:
-    mintable = tokenInfo['mintable']
-
-if "tradable" in metadata:
-    tradable = metadata['tradeable']
-else:
-    tradable = tokenInfo['tradeable']
-
-if "isDAT" in metadata:
-    isDAT = metadata['isDAT']
-else:
-    isDAT = tokenInfo['isDAT']
-
-if "finalize" in metadata:
-    finalize = metadata['finalize']
-else:
-    finalize = tokenInfo['finalized']
-
-# Set token flags
-flag = 0
-
-if mintable:
-    flag |= 0x01
-
-if tradable:
-    flag |= 0x02
-
-if isDAT:
-    flag |= 0x04
-
-if finalize:
-    flag |= 0x10
-
-# Add flag to payload data
-updateTokenPayload += f"{flag:02x}"
+updateTokenPayload = make_update_token_payload(tokenInfo, metadata)
 
 # Create raw transaction
 rawTx = run(["./defi-cli", "createrawtransaction", '[{"txid":"' + utxo['txid'] + '","vout":' + str(utxo['vout']) + '}]',